@@ -1,7 +1,8 @@
 import pygame
+import random
 import sys
 from enum import Enum
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple, Optional
 
 # Initialize Pygame
 pygame.init()
@@ -20,25 +21,8 @@ HIGHLIGHT = (255, 255, 0, 100)  # Semi-transparent yellow
 CHECK_COLOR = (255, 0, 0, 100)  # Semi-transparent red
 INVALID_MOVE_COLOR = (128, 128, 128, 100)  # Semi-transparent gray
 
-# Load images
-PIECES = {
-    "wP": pygame.image.load("images/wP.png"),
-    "wR": pygame.image.load("images/wR.png"),
-    "wN": pygame.image.load("images/wN.png"),
-    "wB": pygame.image.load("images/wB.png"),
-    "wQ": pygame.image.load("images/wQ.png"),
-    "wK": pygame.image.load("images/wK.png"),
-    "bP": pygame.image.load("images/bP.png"),
-    "bR": pygame.image.load("images/bR.png"),
-    "bN": pygame.image.load("images/bN.png"),
-    "bB": pygame.image.load("images/bB.png"),
-    "bQ": pygame.image.load("images/bQ.png"),
-    "bK": pygame.image.load("images/bK.png"),
-}
-
-# Resize piece images
-for piece in PIECES:
-    PIECES[piece] = pygame.transform.scale(PIECES[piece], (SQUARE_SIZE, SQUARE_SIZE))
+# Piece images, filled in by load_piece_images() once the display exists
+PIECES = {}
 
 class PieceType(Enum):
     PAWN = "P"
@@ -52,256 +36,622 @@ class Color(Enum):
     WHITE = "w"
     BLACK = "b"
 
+def load_piece_images() -> None:
+    # Scale once and convert to the display format so blits take the fast path
+    for color in Color:
+        for piece_type in PieceType:
+            key = color.value + piece_type.value
+            image = pygame.image.load(f"images/{key}.png")
+            PIECES[key] = pygame.transform.scale(image, (SQUARE_SIZE, SQUARE_SIZE)).convert_alpha()
+
+# Bitboard layout: bit (row * 8 + col) is set when a piece occupies that square,
+# so bit 0 is the top-left square (a8) and bit 63 the bottom-right one (h1)
+FULL64 = 0xFFFF_FFFF_FFFF_FFFF
+
+# Color and piece indices; piece bitboards live at index color * 6 + piece_type
+WHITE_IDX, BLACK_IDX = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+COLORS = [Color.WHITE, Color.BLACK]
+PIECE_TYPES = [PieceType.PAWN, PieceType.KNIGHT, PieceType.BISHOP,
+               PieceType.ROOK, PieceType.QUEEN, PieceType.KING]
+COLOR_TO_INT = {color: i for i, color in enumerate(COLORS)}
+PIECE_TO_INT = {piece_type: i for i, piece_type in enumerate(PIECE_TYPES)}
+
+INITIAL_BITBOARDS = [
+    0x00FF_0000_0000_0000,  # White pawns
+    0x4200_0000_0000_0000,  # White knights
+    0x2400_0000_0000_0000,  # White bishops
+    0x8100_0000_0000_0000,  # White rooks
+    0x0800_0000_0000_0000,  # White queen
+    0x1000_0000_0000_0000,  # White king
+    0x0000_0000_0000_FF00,  # Black pawns
+    0x0000_0000_0000_0042,  # Black knights
+    0x0000_0000_0000_0024,  # Black bishops
+    0x0000_0000_0000_0081,  # Black rooks
+    0x0000_0000_0000_0008,  # Black queen
+    0x0000_0000_0000_0010,  # Black king
+]
+
+def iter_bits(bb: int) -> Iterator[int]:
+    # Yield the index of each set bit, lowest first, by isolating the LSB
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+# Zobrist keys: one per piece and square, plus side to move and en passant file.
+# A fixed seed keeps position hashes stable between runs.
+_zobrist_rng = random.Random(0xC0FFEE)
+ZOBRIST = [[_zobrist_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+ZOBRIST_EP = [_zobrist_rng.getrandbits(64) for _ in range(COLS)]
+
+# Cached positions are dropped wholesale once a cache grows past this many entries
+CACHE_LIMIT = 65536
+
+def build_leaper_attacks(offsets: List[Tuple[int, int]]) -> List[int]:
+    table = [0] * 64
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        for dr, dc in offsets:
+            new_row, new_col = row + dr, col + dc
+            if 0 <= new_row < ROWS and 0 <= new_col < COLS:
+                table[sq] |= 1 << (new_row * 8 + new_col)
+    return table
+
+# Knight and king targets only depend on the source square
+KNIGHT_ATTACKS = build_leaper_attacks([(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                                       (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = build_leaper_attacks([(-1, -1), (-1, 0), (-1, 1), (0, -1),
+                                     (0, 1), (1, -1), (1, 0), (1, 1)])
+
+def build_pawn_tables() -> Tuple[List[List[int]], List[List[int]], List[List[int]]]:
+    single = [[0] * 64, [0] * 64]
+    double = [[0] * 64, [0] * 64]
+    attacks = [[0] * 64, [0] * 64]
+    for color, direction, start_row in ((WHITE_IDX, -1, 6), (BLACK_IDX, 1, 1)):
+        for sq in range(64):
+            row, col = divmod(sq, 8)
+            new_row = row + direction
+            if not 0 <= new_row < ROWS:
+                continue
+            single[color][sq] = 1 << (new_row * 8 + col)
+            if row == start_row:
+                double[color][sq] = 1 << ((row + 2 * direction) * 8 + col)
+            for dcol in (-1, 1):
+                if 0 <= col + dcol < COLS:
+                    attacks[color][sq] |= 1 << (new_row * 8 + col + dcol)
+    return single, double, attacks
+
+# Pawn pushes and captures per color; double pushes only exist on the start rank
+PAWN_SINGLE, PAWN_DOUBLE, PAWN_ATTACKS = build_pawn_tables()
+
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def ray_mask(sq: int, directions: List[Tuple[int, int]]) -> int:
+    # Squares whose occupancy can stop a ray; the last square on each ray never matters
+    row, col = divmod(sq, 8)
+    mask = 0
+    for dr, dc in directions:
+        new_row, new_col = row + dr, col + dc
+        while 0 <= new_row + dr < ROWS and 0 <= new_col + dc < COLS:
+            mask |= 1 << (new_row * 8 + new_col)
+            new_row, new_col = new_row + dr, new_col + dc
+    return mask
+
+def ray_attacks(sq: int, occupancy: int, directions: List[Tuple[int, int]]) -> int:
+    row, col = divmod(sq, 8)
+    attacks = 0
+    for dr, dc in directions:
+        new_row, new_col = row + dr, col + dc
+        while 0 <= new_row < ROWS and 0 <= new_col < COLS:
+            bit = 1 << (new_row * 8 + new_col)
+            attacks |= bit
+            if occupancy & bit:
+                break
+            new_row, new_col = new_row + dr, new_col + dc
+    return attacks
+
+# Magic multipliers for this square layout, found offline by random search.
+# (blockers & MASK[sq]) * MAGIC[sq] >> SHIFT[sq] maps every blocker set on a
+# square's rays to a slot holding its attack set without harmful collisions.
+ROOK_MAGIC = [
+    0x2080_0014_4002_2581, 0x1080_2000_4000_1080, 0x4080_1000_0820_0080, 0x0280_0800_8010_0254,
+    0x4D80_0400_0A18_0080, 0x0100_0804_0002_0100, 0x1080_0100_4080_0200, 0x0200_0044_0200_2081,
+    0x0068_8000_2488_4004, 0x1000_8040_0080_2002, 0x0002_0020_8A00_1040, 0x3008_8010_0080_0800,
+    0x2006_0010_6044_0A00, 0x1000_8002_0080_0400, 0x0004_0004_4102_4810, 0xA001_0000_8200_4100,
+    0x0040_8080_0020_4014, 0x0000_4240_0220_1000, 0x0010_1100_4100_2000, 0x0000_0900_2104_1000,
+    0x0204_0080_0480_0800, 0x0000_8080_0400_0200, 0x6006_0400_2148_5042, 0x0000_0200_0240_9924,
+    0x2000_4019_8002_8020, 0x4000_4001_0030_8100, 0x0000_8202_0020_1041, 0xB100_1000_8080_0800,
+    0x3004_0800_8004_0080, 0x0802_0002_0004_1009, 0x01A0_5804_0002_1110, 0x0002_0042_0004_08A1,
+    0x4218_8840_0080_0023, 0x0480_2010_0040_0045, 0x0010_2000_8080_1000, 0x1200_2009_0100_1000,
+    0x0000_1008_0100_0500, 0x0080_0200_8080_0400, 0x004A_0001_0040_4080, 0x0480_0054_0200_1081,
+    0x2580_0040_2000_C000, 0xA010_0048_2008_4002, 0x0480_2000_1000_8080, 0x2441_0010_0021_000C,
+    0x2040_0800_0501_0010, 0x0012_0008_1002_0004, 0x0011_0002_00B9_000C, 0x1121_0000_8041_0002,
+    0x0008_2080_410A_0600, 0x4002_0081_0040_2600, 0x0A03_00E0_0854_4100, 0x7B00_0800_1000_8080,
+    0x0300_0801_0010_0500, 0x0002_0200_8004_0080, 0x0042_5218_1021_4400, 0x8A00_0040_8914_0200,
+    0x0000_1280_010A_2041, 0x0400_4011_0204_2086, 0x4190_2000_100C_4101, 0x0043_0204_2090_0009,
+    0x00E2_0004_1008_2002, 0x4402_0001_0804_1002, 0x2100_101A_0081_4804, 0x0400_0104_0021_8246,
+]
+
+BISHOP_MAGIC = [
+    0x0102_0404_1822_0020, 0x0108_0248_0200_2028, 0x8010_0440_4040_0001, 0x0022_2092_0004_4800,
+    0x4004_5040_0504_0114, 0x0022_0104_20A8_0800, 0x0008_4410_0809_0002, 0x0000_4208_0148_0200,
+    0x1100_2202_4401_1C00, 0x0088_3004_081A_B020, 0x4400_1001_5200_2000, 0x4019_0808_4100_4000,
+    0x2861_0212_1000_0000, 0x400E_A101_0840_0020, 0x4800_2082_08A2_4000, 0x0020_A500_A084_2085,
+    0x3410_0008_0250_4400, 0x0010_E020_0C01_0060, 0x0014_1820_4240_8200, 0x4094_0068_4011_2109,
+    0x2014_2002_0201_0000, 0x0001_0002_0080_C400, 0x8004_0042_0D2C_0200, 0x0002_2001_8225_1000,
+    0x0010_F103_04C4_1000, 0x0010_24A0_0828_1084, 0x0088_1100_0204_0100, 0x0820_0800_0100_4008,
+    0x0104_0400_2041_0050, 0x0110_0020_2704_0500, 0x418C_0080_0918_2100, 0x2C00_A904_0C80_480B,
+    0x0081_10C8_0050_20A4, 0x4004_2108_0204_1000, 0x0004_0201_0820_8100, 0x0000_0808_0012_0A00,
+    0x430C_0084_0082_0102, 0x1400_8081_0002_0108, 0x0050_0602_0010_A8A0, 0x0008_0186_8004_A220,
+    0x0042_0105_C00C_2000, 0x1010_9210_3201_9040, 0x0300_2220_2810_3000, 0x0008_0042_0800_1080,
+    0x5410_2022_4881_1400, 0x0008_0108_0080_0808, 0x3C02_C204_0400_0900, 0x0408_0222_8204_0032,
+    0x0000_9410_0210_0000, 0x0112_209A_1010_0804, 0x080C_0201_1121_0000, 0x4420_02A4_4202_2008,
+    0x0008_4A18_1B04_0000, 0x0011_5021_021C_2080, 0x4010_0510_00A2_0000, 0x0404_6880_8506_0000,
+    0x0000_2201_1001_1000, 0x1400_0022_0734_200C, 0x0440_0104_2402_0800, 0x2204_8288_8346_0800,
+    0x0020_0000_0405_0410, 0x4060_004A_2008_2080, 0x0048_9034_B002_C201, 0x0444_0490_1041_0300,
+]
+
+def build_magic_tables(magics: List[int], directions: List[Tuple[int, int]]) -> Tuple[List[int], List[int], List[List[int]]]:
+    masks, shifts, tables = [], [], []
+    for sq in range(64):
+        mask = ray_mask(sq, directions)
+        shift = 64 - bin(mask).count("1")
+        table = [0] * (1 << (64 - shift))
+        # Enumerate every subset of the mask (carry-rippler)
+        blockers = 0
+        while True:
+            table[((blockers * magics[sq]) & FULL64) >> shift] = ray_attacks(sq, blockers, directions)
+            blockers = (blockers - mask) & mask
+            if blockers == 0:
+                break
+        masks.append(mask)
+        shifts.append(shift)
+        tables.append(table)
+    return masks, shifts, tables
+
+ROOK_MASK, ROOK_SHIFT, ROOK_ATTACKS = build_magic_tables(ROOK_MAGIC, ROOK_DIRECTIONS)
+BISHOP_MASK, BISHOP_SHIFT, BISHOP_ATTACKS = build_magic_tables(BISHOP_MAGIC, BISHOP_DIRECTIONS)
+
+def rook_attacks(sq: int, occupancy: int) -> int:
+    return ROOK_ATTACKS[sq][(((occupancy & ROOK_MASK[sq]) * ROOK_MAGIC[sq]) & FULL64) >> ROOK_SHIFT[sq]]
+
+def bishop_attacks(sq: int, occupancy: int) -> int:
+    return BISHOP_ATTACKS[sq][(((occupancy & BISHOP_MASK[sq]) * BISHOP_MAGIC[sq]) & FULL64) >> BISHOP_SHIFT[sq]]
+
+def build_line_tables() -> Tuple[List[List[int]], List[List[int]]]:
+    # For two squares sharing a rank, file or diagonal: the full line through
+    # both of them, and the squares strictly between them
+    line = [[0] * 64 for _ in range(64)]
+    between = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        for dr, dc in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            full = ray_attacks(sq, 0, [(dr, dc), (-dr, -dc)]) | (1 << sq)
+            passed = 0
+            new_row, new_col = row + dr, col + dc
+            while 0 <= new_row < ROWS and 0 <= new_col < COLS:
+                target = new_row * 8 + new_col
+                line[sq][target] = full
+                between[sq][target] = passed
+                passed |= 1 << target
+                new_row, new_col = new_row + dr, new_col + dc
+    return line, between
+
+LINE, BETWEEN = build_line_tables()
+
+# Move generation kernels: pure functions of bitboards returning a target bitboard
+def knight_moves_bb(sq: int, own: int) -> int:
+    return KNIGHT_ATTACKS[sq] & ~own
+
+def king_moves_bb(sq: int, own: int) -> int:
+    return KING_ATTACKS[sq] & ~own
+
+def pawn_moves_bb(color: int, sq: int, occ_all: int, enemy: int, ep_bit: int) -> int:
+    # Move forward, and two squares from the start rank if the first is free
+    empty = ~occ_all & FULL64
+    targets = PAWN_SINGLE[color][sq] & empty
+    if targets:
+        targets |= PAWN_DOUBLE[color][sq] & empty
+    # Capture diagonally
+    return targets | (PAWN_ATTACKS[color][sq] & (enemy | ep_bit))
+
+def rook_moves_bb(sq: int, occ_all: int, own: int) -> int:
+    return rook_attacks(sq, occ_all) & ~own
+
+def bishop_moves_bb(sq: int, occ_all: int, own: int) -> int:
+    return bishop_attacks(sq, occ_all) & ~own
+
+def queen_moves_bb(sq: int, occ_all: int, own: int) -> int:
+    return (rook_attacks(sq, occ_all) | bishop_attacks(sq, occ_all)) & ~own
+
+def square_attacked(bb: List[int], occ_all: int, sq: int, by: int) -> bool:
+    # Look outwards from the target square with each piece's attack pattern
+    offset = by * 6
+    if KNIGHT_ATTACKS[sq] & bb[offset + KNIGHT]:
+        return True
+    if KING_ATTACKS[sq] & bb[offset + KING]:
+        return True
+    if PAWN_ATTACKS[by ^ 1][sq] & bb[offset + PAWN]:
+        return True
+    if rook_attacks(sq, occ_all) & (bb[offset + ROOK] | bb[offset + QUEEN]):
+        return True
+    if bishop_attacks(sq, occ_all) & (bb[offset + BISHOP] | bb[offset + QUEEN]):
+        return True
+    return False
+
+def encode_move(from_sq: int, to_sq: int, promo: int = 0) -> int:
+    # Bits 0-5 hold the source square, 6-11 the target and 12+ the promotion piece
+    return from_sq | (to_sq << 6) | (promo << 12)
+
+def pinned_pieces(bb: List[int], occ_all: int, own: int, king_sq: int, color: int) -> int:
+    # Own pieces that are the only blocker between the king and an enemy slider
+    offset = 6 - color * 6
+    snipers = (rook_attacks(king_sq, 0) & (bb[offset + ROOK] | bb[offset + QUEEN])) | \
+              (bishop_attacks(king_sq, 0) & (bb[offset + BISHOP] | bb[offset + QUEEN]))
+    pinned = 0
+    for sniper in iter_bits(snipers):
+        blockers = BETWEEN[king_sq][sniper] & occ_all
+        if blockers and blockers & (blockers - 1) == 0:
+            pinned |= blockers & own
+    return pinned
+
+def targets_to_moves(targets: int) -> List[Tuple[int, int]]:
+    return [divmod(sq, 8) for sq in iter_bits(targets)]
+
 class Piece:
     def __init__(self, color: Color, piece_type: PieceType):
-        self.color = color
-        self.type = piece_type
+        # Stored as ints; the enums are only used at the UI boundary
+        self.color = COLOR_TO_INT[color]
+        self.type = PIECE_TO_INT[piece_type]
+        self._key = color.value + piece_type.value
 
     def __str__(self):
-        return f"{self.color.value}{self.type.value}"
+        return self._key
 
     def get_legal_moves(self, board: 'Board', row: int, col: int) -> List[Tuple[int, int]]:
-        if self.type == PieceType.PAWN:
+        if self.type == PAWN:
             return board.get_pawn_moves(row, col)
-        elif self.type == PieceType.ROOK:
+        elif self.type == ROOK:
             return board.get_rook_moves(row, col)
-        elif self.type == PieceType.KNIGHT:
+        elif self.type == KNIGHT:
             return board.get_knight_moves(row, col)
-        elif self.type == PieceType.BISHOP:
+        elif self.type == BISHOP:
             return board.get_bishop_moves(row, col)
-        elif self.type == PieceType.QUEEN:
+        elif self.type == QUEEN:
             return board.get_queen_moves(row, col)
-        elif self.type == PieceType.KING:
+        elif self.type == KING:
             return board.get_king_moves(row, col)
         return []
 
+# Shared Piece instances, indexed like Board.bb
+PIECE_OBJECTS = [Piece(COLORS[i // 6], PIECE_TYPES[i % 6]) for i in range(12)]
+
 class Board:
     def __init__(self):
         self.reset()
 
     def reset(self):
-        self.board = [[None for _ in range(COLS)] for _ in range(ROWS)]
+        self.bb = [0] * 12
+        self.occ_w = 0
+        self.occ_b = 0
+        self.occ_all = 0
         self.set_initial_position()
         self.en_passant_target = None
-        self.current_player = Color.WHITE
+        self.side = WHITE_IDX
+        self.hash = self.compute_hash()
         self.move_history = []
+        self.undo_stack = []
+        # Keyed by Zobrist hash, so entries stay valid when a position recurs
+        self._check_cache = {}
+        self._legal_moves_cache = {}
+        # Scratch space reused by get_legal_moves, sized above the 218-move maximum of any position
+        self._move_buffer = [0] * 256
+        self._move_count = 0
+
+    @property
+    def current_player(self) -> Color:
+        return COLORS[self.side]
 
     def set_initial_position(self):
         # Set up the initial chess board position
-        piece_order = [PieceType.ROOK, PieceType.KNIGHT, PieceType.BISHOP, PieceType.QUEEN,
-                       PieceType.KING, PieceType.BISHOP, PieceType.KNIGHT, PieceType.ROOK]
-        
-        for col in range(COLS):
-            self.board[0][col] = Piece(Color.BLACK, piece_order[col])
-            self.board[1][col] = Piece(Color.BLACK, PieceType.PAWN)
-            self.board[6][col] = Piece(Color.WHITE, PieceType.PAWN)
-            self.board[7][col] = Piece(Color.WHITE, piece_order[col])
+        self.bb = INITIAL_BITBOARDS[:]
+        self.occ_w = 0xFFFF_0000_0000_0000
+        self.occ_b = 0x0000_0000_0000_FFFF
+        self.occ_all = self.occ_w | self.occ_b
+        self.king_sq = [60, 4]
+
+        # Mailbox mirror of the bitboards: the piece index on each square, or None
+        self.mb = [None] * 64
+        for piece, bb in enumerate(self.bb):
+            for sq in iter_bits(bb):
+                self.mb[sq] = piece
+
+    def compute_hash(self) -> int:
+        position_hash = 0
+        for piece, bb in enumerate(self.bb):
+            for sq in iter_bits(bb):
+                position_hash ^= ZOBRIST[piece][sq]
+        if self.side == BLACK_IDX:
+            position_hash ^= ZOBRIST_SIDE
+        if self.en_passant_target is not None:
+            position_hash ^= ZOBRIST_EP[self.en_passant_target[1]]
+        return position_hash
+
+    def piece_index_at(self, sq: int) -> Optional[int]:
+        return self.mb[sq]
 
     def is_valid_position(self, row: int, col: int) -> bool:
         return 0 <= row < ROWS and 0 <= col < COLS
 
+    def own_occupancy(self, sq: int) -> Optional[int]:
+        bit = 1 << sq
+        if self.occ_w & bit:
+            return self.occ_w
+        if self.occ_b & bit:
+            return self.occ_b
+        return None
+
     def get_piece(self, row: int, col: int) -> Optional[Piece]:
         if self.is_valid_position(row, col):
-            return self.board[row][col]
+            index = self.piece_index_at(row * 8 + col)
+            if index is not None:
+                return PIECE_OBJECTS[index]
         return None
 
     def is_enemy(self, piece1: Piece, piece2: Piece) -> bool:
         return piece1 is not None and piece2 is not None and piece1.color != piece2.color
 
+    def update_occupancy(self, color: int, move_bits: int, captured_bits: int) -> None:
+        if color == WHITE_IDX:
+            self.occ_w ^= move_bits
+            self.occ_b ^= captured_bits
+        else:
+            self.occ_b ^= move_bits
+            self.occ_w ^= captured_bits
+        self.occ_all = self.occ_w | self.occ_b
+
     def make_move(self, start: Tuple[int, int], end: Tuple[int, int]) -> None:
-        start_row, start_col = start
-        end_row, end_col = end
-        piece = self.board[start_row][start_col]
-        
-        # Handle en passant capture
-        if piece.type == PieceType.PAWN and (end_row, end_col) == self.en_passant_target:
-            self.board[start_row][end_col] = None
-        
+        self.make_move_sq(start[0] * 8 + start[1], end[0] * 8 + end[1])
+
+    def make_move_sq(self, from_sq: int, to_sq: int, promo: int = 0) -> None:
+        from_bit = 1 << from_sq
+        to_bit = 1 << to_sq
+        mb = self.mb
+        piece = mb[from_sq]
+        color, piece_type = divmod(piece, 6)
+        enemy_offset = 6 - color * 6
+
+        position_hash = self.hash ^ ZOBRIST_SIDE ^ ZOBRIST[piece][from_sq]
+
+        # Handle captures, including en passant
+        captured = mb[to_sq]
+        captured_sq = to_sq
+        if captured is None and piece_type == PAWN and divmod(to_sq, 8) == self.en_passant_target:
+            captured = enemy_offset + PAWN
+            captured_sq = (from_sq & ~7) | (to_sq & 7)
+            mb[captured_sq] = None
+        if captured is None:
+            captured_bit = 0
+        else:
+            captured_bit = 1 << captured_sq
+            self.bb[captured] ^= captured_bit
+            position_hash ^= ZOBRIST[captured][captured_sq]
+
         # Move the piece
-        self.board[end_row][end_col] = piece
-        self.board[start_row][start_col] = None
-        
-        # Handle pawn promotion (always promote to queen for simplicity)
-        if piece.type == PieceType.PAWN and (end_row == 0 or end_row == 7):
-            self.board[end_row][end_col] = Piece(piece.color, PieceType.QUEEN)
-        
+        self.bb[piece] ^= from_bit | to_bit
+        if piece_type == KING:
+            self.king_sq[color] = to_sq
+
+        # Handle pawn promotion (to a queen unless the move says otherwise)
+        promoted = None
+        if piece_type == PAWN and (to_sq < 8 or to_sq >= 56):
+            promoted = color * 6 + (promo or QUEEN)
+            self.bb[piece] ^= to_bit
+            self.bb[promoted] ^= to_bit
+        mb[from_sq] = None
+        mb[to_sq] = piece if promoted is None else promoted
+        position_hash ^= ZOBRIST[mb[to_sq]][to_sq]
+
+        self.update_occupancy(color, from_bit | to_bit, captured_bit)
+        self.undo_stack.append((piece, from_bit, to_bit, captured, captured_bit, promoted,
+                                self.en_passant_target, self.hash))
+
         # Update en passant target
+        if self.en_passant_target is not None:
+            position_hash ^= ZOBRIST_EP[self.en_passant_target[1]]
         self.en_passant_target = None
-        if piece.type == PieceType.PAWN and abs(start_row - end_row) == 2:
-            self.en_passant_target = (end_row + (start_row - end_row) // 2, end_col)
-        
+        if piece_type == PAWN and abs(from_sq - to_sq) == 16:
+            self.en_passant_target = divmod((from_sq + to_sq) // 2, 8)
+            position_hash ^= ZOBRIST_EP[to_sq & 7]
+        self.hash = position_hash
+
         # Switch current player
-        self.current_player = Color.BLACK if self.current_player == Color.WHITE else Color.WHITE
-        
-        # Add move to history
-        self.move_history.append((start, end))
+        self.side ^= 1
 
-    def get_pawn_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        moves = []
-        piece = self.get_piece(row, col)
+        # Add move to history
+        self.move_history.append(encode_move(from_sq, to_sq, promo))
+
+    def unmake_move(self) -> None:
+        (piece, from_bit, to_bit, captured, captured_bit, promoted,
+         en_passant_target, position_hash) = self.undo_stack.pop()
+        color, piece_type = divmod(piece, 6)
+        if piece_type == KING:
+            self.king_sq[color] = from_bit.bit_length() - 1
+
+        if promoted is not None:
+            self.bb[promoted] ^= to_bit
+            self.bb[piece] ^= to_bit
+        self.bb[piece] ^= from_bit | to_bit
+        self.mb[from_bit.bit_length() - 1] = piece
+        self.mb[to_bit.bit_length() - 1] = None
+        if captured is not None:
+            self.bb[captured] ^= captured_bit
+            self.mb[captured_bit.bit_length() - 1] = captured
+
+        self.update_occupancy(color, from_bit | to_bit, captured_bit)
+        self.en_passant_target = en_passant_target
+        self.hash = position_hash
+        self.side ^= 1
+        self.move_history.pop()
+
+    def en_passant_bit(self) -> int:
+        if self.en_passant_target is None:
+            return 0
+        ep_row, ep_col = self.en_passant_target
+        return 1 << (ep_row * 8 + ep_col)
+
+    def get_targets(self, sq: int) -> int:
+        # Pseudo-legal destinations of the piece on sq, as a bitboard
+        piece = self.piece_index_at(sq)
         if piece is None:
-            return moves
-
-        direction = -1 if piece.color == Color.WHITE else 1
-        start_row = 6 if piece.color == Color.WHITE else 1
+            return 0
+        color, piece_type = divmod(piece, 6)
+        own, enemy = (self.occ_w, self.occ_b) if color == WHITE_IDX else (self.occ_b, self.occ_w)
+        if piece_type == PAWN:
+            return pawn_moves_bb(color, sq, self.occ_all, enemy, self.en_passant_bit())
+        elif piece_type == KNIGHT:
+            return knight_moves_bb(sq, own)
+        elif piece_type == BISHOP:
+            return bishop_moves_bb(sq, self.occ_all, own)
+        elif piece_type == ROOK:
+            return rook_moves_bb(sq, self.occ_all, own)
+        elif piece_type == QUEEN:
+            return queen_moves_bb(sq, self.occ_all, own)
+        return king_moves_bb(sq, own)
 
-        # Move forward
-        if self.get_piece(row + direction, col) is None:
-            moves.append((row + direction, col))
-            # Double move from start position
-            if row == start_row and self.get_piece(row + 2*direction, col) is None:
-                moves.append((row + 2*direction, col))
-
-        # Capture diagonally
-        for dcol in [-1, 1]:
-            if self.is_valid_position(row + direction, col + dcol):
-                target = self.get_piece(row + direction, col + dcol)
-                if self.is_enemy(piece, target) or (row + direction, col + dcol) == self.en_passant_target:
-                    moves.append((row + direction, col + dcol))
-
-        return moves
+    def get_pawn_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
+        sq = row * 8 + col
+        bit = 1 << sq
+        if self.occ_w & bit:
+            color, enemy = WHITE_IDX, self.occ_b
+        elif self.occ_b & bit:
+            color, enemy = BLACK_IDX, self.occ_w
+        else:
+            return []
+        return targets_to_moves(pawn_moves_bb(color, sq, self.occ_all, enemy, self.en_passant_bit()))
 
     def get_rook_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        moves = []
-        piece = self.get_piece(row, col)
-        if piece is None:
-            return moves
-
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for dr, dc in directions:
-            for i in range(1, 8):
-                new_row, new_col = row + i*dr, col + i*dc
-                if not self.is_valid_position(new_row, new_col):
-                    break
-                target = self.get_piece(new_row, new_col)
-                if target is None:
-                    moves.append((new_row, new_col))
-                elif self.is_enemy(piece, target):
-                    moves.append((new_row, new_col))
-                    break
-                else:
-                    break
-        return moves
+        sq = row * 8 + col
+        own = self.own_occupancy(sq)
+        if own is None:
+            return []
+        return targets_to_moves(rook_moves_bb(sq, self.occ_all, own))
 
     def get_knight_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        moves = []
-        piece = self.get_piece(row, col)
-        if piece is None:
-            return moves
-
-        knight_moves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                        (1, -2), (1, 2), (2, -1), (2, 1)]
-        for dr, dc in knight_moves:
-            new_row, new_col = row + dr, col + dc
-            if self.is_valid_position(new_row, new_col):
-                target = self.get_piece(new_row, new_col)
-                if target is None or self.is_enemy(piece, target):
-                    moves.append((new_row, new_col))
-        return moves
+        sq = row * 8 + col
+        own = self.own_occupancy(sq)
+        if own is None:
+            return []
+        return targets_to_moves(knight_moves_bb(sq, own))
 
     def get_bishop_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        moves = []
-        piece = self.get_piece(row, col)
-        if piece is None:
-            return moves
-
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for dr, dc in directions:
-            for i in range(1, 8):
-                new_row, new_col = row + i*dr, col + i*dc
-                if not self.is_valid_position(new_row, new_col):
-                    break
-                target = self.get_piece(new_row, new_col)
-                if target is None:
-                    moves.append((new_row, new_col))
-                elif self.is_enemy(piece, target):
-                    moves.append((new_row, new_col))
-                    break
-                else:
-                    break
-        return moves
+        sq = row * 8 + col
+        own = self.own_occupancy(sq)
+        if own is None:
+            return []
+        return targets_to_moves(bishop_moves_bb(sq, self.occ_all, own))
 
     def get_queen_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        return self.get_rook_moves(row, col) + self.get_bishop_moves(row, col)
+        sq = row * 8 + col
+        own = self.own_occupancy(sq)
+        if own is None:
+            return []
+        return targets_to_moves(queen_moves_bb(sq, self.occ_all, own))
 
     def get_king_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        moves = []
-        piece = self.get_piece(row, col)
-        if piece is None:
-            return moves
-
-        king_moves = [(-1, -1), (-1, 0), (-1, 1), (0, -1),
-                      (0, 1), (1, -1), (1, 0), (1, 1)]
-        for dr, dc in king_moves:
-            new_row, new_col = row + dr, col + dc
-            if self.is_valid_position(new_row, new_col):
-                target = self.get_piece(new_row, new_col)
-                if target is None or self.is_enemy(piece, target):
-                    moves.append((new_row, new_col))
-        return moves
+        sq = row * 8 + col
+        own = self.own_occupancy(sq)
+        if own is None:
+            return []
+        return targets_to_moves(king_moves_bb(sq, own))
 
     def is_square_attacked(self, row: int, col: int, attacking_color: Color) -> bool:
-        for r in range(ROWS):
-            for c in range(COLS):
-                piece = self.get_piece(r, c)
-                if piece is not None and piece.color == attacking_color:
-                    if (row, col) in piece.get_legal_moves(self, r, c):
-                        return True
-        return False
+        return square_attacked(self.bb, self.occ_all, row * 8 + col, COLOR_TO_INT[attacking_color])
 
-    def find_king(self, color: Color) -> Optional[Tuple[int, int]]:
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.get_piece(row, col)
-                if piece is not None and piece.color == color and piece.type == PieceType.KING:
-                    return row, col
-        return None
+    def find_king(self, color: Color) -> Tuple[int, int]:
+        return divmod(self.king_sq[COLOR_TO_INT[color]], 8)
 
     def is_in_check(self, color: Color) -> bool:
-        king_pos = self.find_king(color)
-        if king_pos is None:
-            return False
-        return self.is_square_attacked(king_pos[0], king_pos[1], Color.BLACK if color == Color.WHITE else Color.WHITE)
+        return self.king_in_check(COLOR_TO_INT[color])
+
+    def king_in_check(self, color_idx: int) -> bool:
+        key = (self.hash, color_idx)
+        in_check = self._check_cache.get(key)
+        if in_check is None:
+            in_check = square_attacked(self.bb, self.occ_all, self.king_sq[color_idx], color_idx ^ 1)
+            if len(self._check_cache) >= CACHE_LIMIT:
+                self._check_cache.clear()
+            self._check_cache[key] = in_check
+        return in_check
+
+    def has_any_legal_move(self, color: Color) -> bool:
+        own = self.occ_w if color == Color.WHITE else self.occ_b
+        for sq in iter_bits(own):
+            if self.get_legal_moves(sq // 8, sq % 8):
+                return True
+        return False
 
     def is_checkmate(self, color: Color) -> bool:
-        if not self.is_in_check(color):
-            return False
-        
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.get_piece(row, col)
-                if piece is not None and piece.color == color:
-                    legal_moves = self.get_legal_moves(row, col)
-                    if legal_moves:
-                        return False
-        return True
+        return self.is_in_check(color) and not self.has_any_legal_move(color)
 
     def is_stalemate(self, color: Color) -> bool:
-        if self.is_in_check(color):
-            return False
-        
-        for row in range(ROWS):
-            for col in range(COLS):
-                piece = self.get_piece(row, col)
-                if piece is not None and piece.color == color:
-                    legal_moves = self.get_legal_moves(row, col)
-                    if legal_moves:
-                        return False
-        return True
+        return not self.is_in_check(color) and not self.has_any_legal_move(color)
+
+    def get_legal_moves(self, row: int, col: int) -> List[int]:
+        sq = row * 8 + col
+        key = (self.hash, sq)
+        legal_moves = self._legal_moves_cache.get(key)
+        if legal_moves is not None:
+            return legal_moves
 
-    def get_legal_moves(self, row: int, col: int) -> List[Tuple[int, int]]:
-        piece = self.get_piece(row, col)
+        piece = self.piece_index_at(sq)
         if piece is None:
             return []
 
-        moves = piece.get_legal_moves(self, row, col)
-        legal_moves = []
-        for move in moves:
-            temp_board = Board()
-            temp_board.board = [row[:] for row in self.board]
-            temp_board.make_move((row, col), move)
-            if not temp_board.is_in_check(piece.color):
-                legal_moves.append(move)
+        color, piece_type = divmod(piece, 6)
+        targets = self.get_targets(sq)
+        buffer = self._move_buffer
+        count = 0
+        if piece_type == KING:
+            # Lift the king off the board so a checking slider also covers the squares behind it
+            occ_all = self.occ_all ^ (1 << sq)
+            for target in iter_bits(targets):
+                if not square_attacked(self.bb, occ_all, target, color ^ 1):
+                    buffer[count] = encode_move(sq, target)
+                    count += 1
+            self._move_count = count
+            return self.store_legal_moves(key, buffer[:count])
+
+        # Only check evasions and en passant captures need a full make/unmake test;
+        # otherwise a move is legal unless it takes a pinned piece off its pin line
+        if self.king_in_check(color):
+            verify = targets
+        else:
+            verify = self.en_passant_bit() if piece_type == PAWN else 0
+            own = self.occ_w if color == WHITE_IDX else self.occ_b
+            king_sq = self.king_sq[color]
+            if pinned_pieces(self.bb, self.occ_all, own, king_sq, color) & (1 << sq):
+                targets &= LINE[king_sq][sq]
+
+        for target in iter_bits(targets):
+            if (verify >> target) & 1:
+                self.make_move_sq(sq, target)
+                in_check = self.king_in_check(color)
+                self.unmake_move()
+                if in_check:
+                    continue
+            buffer[count] = encode_move(sq, target)
+            count += 1
+        self._move_count = count
+        return self.store_legal_moves(key, buffer[:count])
+
+    def store_legal_moves(self, key: Tuple[int, int], legal_moves: List[int]) -> List[int]:
+        if len(self._legal_moves_cache) >= CACHE_LIMIT:
+            self._legal_moves_cache.clear()
+        self._legal_moves_cache[key] = legal_moves
         return legal_moves
 
 class ChessGame:
@@ -309,9 +659,22 @@ class ChessGame:
         self.board = Board()
         self.selected_piece = None
         self.dragging_piece = None
-        self.legal_moves = []
+        self.legal_moves = set()
         self.game_over = False
         self.winner = None
+        # King squares to paint red; only recomputed after a move
+        self._check_dirty = True
+        self._cached_check_squares = []
+        self.board_surface = self.render_board_surface()
+
+    def render_board_surface(self) -> pygame.Surface:
+        # The squares never change, so draw them once and blit the result each frame
+        surface = pygame.Surface((WIDTH, HEIGHT))
+        for row in range(ROWS):
+            for col in range(COLS):
+                color = LIGHT_BROWN if (row + col) % 2 == 0 else DARK_BROWN
+                pygame.draw.rect(surface, color, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        return surface.convert()
 
     def handle_click(self, pos: Tuple[int, int]) -> None:
         if self.game_over:
@@ -321,37 +684,41 @@ class ChessGame:
         piece = self.board.get_piece(row, col)
         
         if self.selected_piece is None:
-            if piece is not None and piece.color == self.board.current_player:
+            if piece is not None and piece.color == self.board.side:
                 self.selected_piece = (row, col)
-                self.dragging_piece = (str(piece), pos)
-                self.legal_moves = self.board.get_legal_moves(row, col)
+                self.dragging_piece = (piece._key, pos)
+                self.legal_moves = set(self.board.get_legal_moves(row, col))
         else:
-            if (row, col) in self.legal_moves:
+            selected_row, selected_col = self.selected_piece
+            if encode_move(selected_row * 8 + selected_col, row * 8 + col) in self.legal_moves:
                 self.board.make_move(self.selected_piece, (row, col))
+                self._check_dirty = True
                 self.selected_piece = None
                 self.dragging_piece = None
-                self.legal_moves = []
+                self.legal_moves = set()
                 self.check_game_over()
-            elif piece is not None and piece.color == self.board.current_player:
+            elif piece is not None and piece.color == self.board.side:
                 self.selected_piece = (row, col)
-                self.dragging_piece = (str(piece), pos)
-                self.legal_moves = self.board.get_legal_moves(row, col)
+                self.dragging_piece = (piece._key, pos)
+                self.legal_moves = set(self.board.get_legal_moves(row, col))
             else:
                 self.selected_piece = None
                 self.dragging_piece = None
-                self.legal_moves = []
+                self.legal_moves = set()
 
     def handle_drag(self, pos: Tuple[int, int]) -> None:
         if self.dragging_piece:
             self.dragging_piece = (self.dragging_piece[0], pos)
 
     def check_game_over(self) -> None:
-        if self.board.is_checkmate(self.board.current_player):
+        # One scan for any legal move decides both checkmate and stalemate
+        color = self.board.current_player
+        if not self.board.has_any_legal_move(color):
             self.game_over = True
-            self.winner = Color.WHITE if self.board.current_player == Color.BLACK else Color.BLACK
-        elif self.board.is_stalemate(self.board.current_player):
-            self.game_over = True
-            self.winner = None
+            if self.board.is_in_check(color):
+                self.winner = Color.WHITE if color == Color.BLACK else Color.BLACK
+            else:
+                self.winner = None
 
     def draw(self, screen: pygame.Surface) -> None:
         self.draw_board(screen)
@@ -360,17 +727,14 @@ class ChessGame:
         self.draw_game_over(screen)
 
     def draw_board(self, screen: pygame.Surface) -> None:
-        for row in range(ROWS):
-            for col in range(COLS):
-                color = LIGHT_BROWN if (row + col) % 2 == 0 else DARK_BROWN
-                pygame.draw.rect(screen, color, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        screen.blit(self.board_surface, (0, 0))
 
     def draw_pieces(self, screen: pygame.Surface) -> None:
-        for row in range(ROWS):
-            for col in range(COLS):
+        for sq in iter_bits(self.board.occ_all):
+            row, col = divmod(sq, 8)
+            if (row, col) != self.selected_piece:
                 piece = self.board.get_piece(row, col)
-                if piece is not None and (row, col) != self.selected_piece:
-                    screen.blit(PIECES[str(piece)], (col * SQUARE_SIZE, row * SQUARE_SIZE))
+                screen.blit(PIECES[piece._key], (col * SQUARE_SIZE, row * SQUARE_SIZE))
         
         if self.dragging_piece:
             piece, pos = self.dragging_piece
@@ -382,17 +746,17 @@ class ChessGame:
             pygame.draw.rect(screen, HIGHLIGHT, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
         
         for move in self.legal_moves:
-            row, col = move
+            row, col = divmod((move >> 6) & 63, 8)
             pygame.draw.circle(screen, HIGHLIGHT, 
                                (col * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2), 
                                SQUARE_SIZE // 6)
 
-        for color in [Color.WHITE, Color.BLACK]:
-            if self.board.is_in_check(color):
-                king_pos = self.board.find_king(color)
-                if king_pos:
-                    row, col = king_pos
-                    pygame.draw.rect(screen, CHECK_COLOR, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        if self._check_dirty:
+            self._cached_check_squares = [self.board.find_king(color) for color in [Color.WHITE, Color.BLACK]
+                                          if self.board.is_in_check(color)]
+            self._check_dirty = False
+        for row, col in self._cached_check_squares:
+            pygame.draw.rect(screen, CHECK_COLOR, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
 
     def draw_game_over(self, screen: pygame.Surface) -> None:
         if self.game_over:
@@ -409,6 +773,7 @@ class ChessGame:
 def main():
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Chess Game")
+    load_piece_images()
     clock = pygame.time.Clock()
     game = ChessGame()
 